@@ -2,18 +2,141 @@
 Este script genera gráficas para el análisis del aguacate en México.
 """
 
+import textwrap
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 
 import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
+import plotly.io as pio
 
 
 PAPER_BGCOLOR = "#31363F"
 PLOT_BGCOLOR = "#222831"
 
 
-def comparacion_pib(campo, titulo, archivo):
+@lru_cache(maxsize=None)
+def cargar_siap():
+    """
+    Carga el dataset de la producción de aguacate del SIAP.
+    El resultado se guarda en caché para no leer el CSV más de una vez.
+    """
+
+    # El motor de PyArrow analiza el CSV en paralelo.
+    # Solo leemos las columnas que usan las gráficas.
+    df = pd.read_csv(
+        "./data/siap_produccion.csv",
+        engine="pyarrow",
+        usecols=["Anio", "Volumenproduccion", "Valorproduccion"],
+    )
+
+    # El año cabe de sobra en 32 bits y una llave más angosta
+    # acelera las agrupaciones.
+    df["Anio"] = df["Anio"].astype("int32")
+
+    return df
+
+
+@lru_cache(maxsize=None)
+def siap_anual():
+    """
+    Agrupa la producción de aguacate del SIAP por año.
+    El resultado se guarda en caché, ya que varias gráficas lo utilizan.
+    """
+
+    # Al nombrar las columnas, la agrupación usa la ruta rápida
+    # de pandas y se ahorra la inspección de tipos de numeric_only.
+    return cargar_siap().groupby("Anio")[["Volumenproduccion", "Valorproduccion"]].sum()
+
+
+@lru_cache(maxsize=None)
+def cargar_inegi():
+    """
+    Carga el dataset de exportaciones anuales del INEGI.
+    El resultado se guarda en caché para no leer el CSV más de una vez.
+    """
+
+    # El motor de PyArrow analiza el CSV en paralelo.
+    # Solo leemos las columnas que usan las gráficas.
+    df = pd.read_csv(
+        "./data/inegi_exportaciones.csv",
+        engine="pyarrow",
+        usecols=["TIPO", "ANIO", "PAIS_O_D", "CANTIDAD"],
+    )
+
+    # El año cabe de sobra en 32 bits y una llave más angosta
+    # acelera las agrupaciones.
+    df["ANIO"] = df["ANIO"].astype("int32")
+
+    # TIPO solo tiene un par de valores distintos; como categoría,
+    # los filtros comparan códigos enteros en lugar de cadenas.
+    df["TIPO"] = df["TIPO"].astype("category")
+
+    return df
+
+
+@lru_cache(maxsize=None)
+def cargar_banxico():
+    """
+    Carga el dataset de exportaciones mensuales de Banxico.
+    El resultado se guarda en caché para no leer el CSV más de una vez.
+    """
+
+    return pd.read_csv(
+        "./data/banxico_exportaciones.csv", parse_dates=["Fecha"], index_col=0
+    )
+
+
+@lru_cache(maxsize=None)
+def cargar_profeco():
+    """
+    Carga el dataset de precios al consumidor de PROFECO.
+    El resultado se guarda en caché para no leer el CSV más de una vez.
+    """
+
+    # El motor de PyArrow analiza el CSV y sus fechas en paralelo.
+    # Solo leemos las columnas que usan las gráficas.
+    # El índice se asigna después de leer: con este motor,
+    # 'parse_dates' no aplica a la columna nombrada en 'index_col'.
+    df = pd.read_csv(
+        "./data/profeco_precios.csv",
+        engine="pyarrow",
+        usecols=["fecha_registro", "precio"],
+        parse_dates=["fecha_registro"],
+    )
+
+    return df.set_index("fecha_registro")
+
+
+@lru_cache(maxsize=None)
+def cargar_pib():
+    """
+    Carga el dataset del PIB nominal (corriente) del INEGI.
+    El resultado se guarda en caché para no leer el CSV más de una vez.
+    """
+
+    # El motor de PyArrow analiza el CSV y sus fechas en paralelo.
+    return pd.read_csv(
+        "./assets/PIB_corriente.csv",
+        engine="pyarrow",
+        parse_dates=["Fecha"],
+        index_col=0,
+    )
+
+
+@lru_cache(maxsize=None)
+def cargar_paises():
+    """
+    Carga el catálogo de países.
+    El resultado se guarda en caché para no leer el CSV más de una vez.
+    """
+
+    return pd.read_csv("./assets/paises.csv", index_col=0)
+
+
+def comparacion_pib(campo, titulo):
     """
     Esta función compara el valor de la producción de aguacate
      con diversos componentes del PIB de México.
@@ -26,21 +149,17 @@ def comparacion_pib(campo, titulo, archivo):
     campo : str
         El campo que se desea comparar.
 
-    archivo : str
-        El nombre que tendra el archivo generado.
-
     """
 
     # Cargamos el dataset del PIB nominal (corriente).
-    pib = pd.read_csv("./assets/PIB_corriente.csv", parse_dates=["Fecha"], index_col=0)
-    pib = pib.resample("YS").sum() / 4
+    # El promedio anual equivale a sumar los cuatro trimestres
+    # y dividir entre cuatro, pero en una sola pasada.
+    pib = cargar_pib()
+    pib = pib.resample("YS").mean()
     pib.index = pib.index.year
 
-    # Cargamos el dataset de la producción de aguacate en México.
-    df = pd.read_csv("./data/siap_produccion.csv")
-
-    # Calculamos el valor de la producción anual.
-    df = df.groupby("Anio").sum(numeric_only=True)[["Valorproduccion"]]
+    # Cargamos el valor de la producción anual de aguacate en México.
+    df = siap_anual()[["Valorproduccion"]]
 
     # Agregamos la columna del PIB. Le quitamos los puntos decimales.
     df["pib"] = pib[campo] * 1000000
@@ -52,12 +171,14 @@ def comparacion_pib(campo, titulo, archivo):
     df["change"] = df["perc"].pct_change() * 100
 
     # Definimos los colores para crecimiento y reduciión.
-    df["color"] = df["change"].apply(
-        lambda x: "hsl(34, 100%, 20%)" if x < 0 else "hsl(93, 100%, 20%)"
+    # np.where evalúa toda la columna de un solo golpe, sin
+    # iterar fila por fila como lo haría apply().
+    df["color"] = np.where(
+        df["change"].to_numpy() < 0, "hsl(34, 100%, 20%)", "hsl(93, 100%, 20%)"
     )
 
-    df["bar_color"] = df["change"].apply(
-        lambda x: "hsl(34, 100%, 65%)" if x < 0 else "hsl(93, 100%, 65%)"
+    df["bar_color"] = np.where(
+        df["change"].to_numpy() < 0, "hsl(34, 100%, 65%)", "hsl(93, 100%, 65%)"
     )
 
     # Escogemos los últimos 20 años.
@@ -182,7 +303,7 @@ def comparacion_pib(campo, titulo, archivo):
         ],
     )
 
-    fig.write_image(f"./pib_{archivo}.png")
+    return fig
 
 
 def top_exportaciones(año):
@@ -197,10 +318,10 @@ def top_exportaciones(año):
     """
 
     # Cargamos el catálogo de países.
-    paises = pd.read_csv("./assets/paises.csv", index_col=0)
+    paises = cargar_paises()
 
     # Cargamos el dataset de exportaciones del INEGI.
-    df = pd.read_csv("./data/inegi_exportaciones.csv")
+    df = cargar_inegi()
 
     # Filtramos por el año que nos interesa.
     df = df[df["ANIO"] == año]
@@ -209,12 +330,15 @@ def top_exportaciones(año):
     df = df[df["TIPO"] == "Exportaciones"]
 
     # En el dataset, los totales no tienen código de país. Le aisgnaremos uno.
-    df["PAIS_O_D"] = df["PAIS_O_D"].fillna("TOTAL")
+    # Convertimos la columna a categoría para que la agrupación
+    # trabaje con códigos enteros en lugar de cadenas.
+    df["PAIS_O_D"] = df["PAIS_O_D"].fillna("TOTAL").astype("category")
 
     # Agrupamos por páis de destino usando el valor más alto.
     # En ocasiones las cifras reales no están en la categoría principal
     # sino en las subcategorías.
-    df = df.groupby("PAIS_O_D").max(numeric_only=True)
+    # Solo agregamos la columna que utilizaremos.
+    df = df.groupby("PAIS_O_D", observed=True)[["CANTIDAD"]].max()
 
     # Asignamos el nombre de cada país.
     df["nombre"] = paises["nombre"]
@@ -233,18 +357,24 @@ def top_exportaciones(año):
     df = df.iloc[1:16]
 
     # Los nombres largos los partimos en dos.
-    df["nombre"] = df["nombre"].str.wrap(15).str.replace("\n", "<br>")
+    # Lo hacemos en una sola pasada, sin Series intermedias.
+    df["nombre"] = [
+        textwrap.fill(nombre, 15).replace("\n", "<br>") for nombre in df["nombre"]
+    ]
 
     # Creamos el texto para cada barra.
-    df["texto"] = df.apply(
-        lambda x: f" {x['CANTIDAD']:,.0f} ({x['perc']:,.2f}%) ", axis=1
-    )
+    # Iteramos sobre los arreglos de NumPy directamente para evitar
+    # que apply() construya una Series por cada fila.
+    df["texto"] = [
+        f" {cantidad:,.0f} ({perc:,.2f}%) "
+        for cantidad, perc in zip(df["CANTIDAD"].to_numpy(), df["perc"].to_numpy())
+    ]
 
     # Calculamos la razón.
     df["ratio"] = np.log10(df["CANTIDAD"]) / np.log10(df["CANTIDAD"].max())
 
     # Calculamos la posición del texto en cada barra.
-    df["text_pos"] = df["ratio"].apply(lambda x: "inside" if x >= 0.91 else "outside")
+    df["text_pos"] = np.where(df["ratio"].to_numpy() >= 0.91, "inside", "outside")
 
     fig = go.Figure()
 
@@ -347,7 +477,7 @@ def top_exportaciones(año):
         ],
     )
 
-    fig.write_image(f"./top_exports_{año}.png")
+    return fig
 
 
 def composicion_produccion():
@@ -356,23 +486,21 @@ def composicion_produccion():
     Se separa por tipo de mercado: local y exportación.
     """
 
-    # Cargamos el dataset de la producción de aguacate en México.
-    df = pd.read_csv("./data/siap_produccion.csv")
-
-    # Agrupamos por año.
-    df = df.groupby("Anio").sum(numeric_only=True)
+    # Cargamos la producción anual de aguacate en México.
+    df = siap_anual().copy()
 
     # Cargamos el dataset de exportaciones del INEGI.
-    exportacioes = pd.read_csv("./data/inegi_exportaciones.csv")
+    exportacioes = cargar_inegi()
 
     # Seleccionamos solamente las exportaciones.
     exportacioes = exportacioes[exportacioes["TIPO"] == "Exportaciones"]
 
     # Agrupamos por año, seleccionando el vaor máximo.
-    exportacioes = exportacioes.groupby("ANIO").max(numeric_only=True)
+    # Solo agregamos la columna que utilizaremos.
+    exportacioes = exportacioes.groupby("ANIO")["CANTIDAD"].max()
 
     # Agregamos las toneldas de exportación.
-    df["exportaciones"] = exportacioes["CANTIDAD"] / 1000
+    df["exportaciones"] = exportacioes / 1000
 
     # Calculamos el consumo local.
     df["local"] = df["Volumenproduccion"] - df["exportaciones"]
@@ -509,7 +637,7 @@ def composicion_produccion():
         ],
     )
 
-    fig.write_image("./composicion_produccion.png")
+    return fig
 
 
 def tendencia_mensual():
@@ -518,11 +646,8 @@ def tendencia_mensual():
     """
 
     # Cargamos el dataset de las cifras de exportación mensual.
-    df = pd.read_csv(
-        "./data/banxico_exportaciones.csv", parse_dates=["Fecha"], index_col=0
-    )
     # Convertimos de miles de dólares a millones de dólares.
-    df /= 1000
+    df = cargar_banxico() / 1000
 
     # Calculamos el promedio móvil a 12 periodos.
     df["rolling"] = df["USD_miles"].rolling(12).mean()
@@ -531,10 +656,9 @@ def tendencia_mensual():
     df = df.tail(102)
 
     # Creamos una copia del DataFrame exclusivamente para los meses de febrero.
+    # where() anula de un solo golpe los valores de los demás meses.
     febrero = df.copy()
-    febrero["USD_miles"] = febrero.apply(
-        lambda x: x["USD_miles"] if x.name.month == 2 else None, axis=1
-    )
+    febrero["USD_miles"] = df["USD_miles"].where(df.index.month == 2)
 
     fig = go.Figure()
 
@@ -659,7 +783,7 @@ def tendencia_mensual():
         ],
     )
 
-    fig.write_image("./tendencia_mensual.png")
+    return fig
 
 
 def precio_medio_rural():
@@ -668,11 +792,8 @@ def precio_medio_rural():
     y el precio final al consumidor.
     """
 
-    # Cargamos el dataset de la producción de aguacate en México.
-    df = pd.read_csv("./data/siap_produccion.csv")
-
-    # Agrupamos por año.
-    df = df.groupby("Anio").sum(numeric_only=True)
+    # Cargamos la producción anual de aguacate en México.
+    df = siap_anual().copy()
 
     # Convertimos las toneladas a kilogramos.
     df["Volumenproduccion"] *= 1000
@@ -681,11 +802,7 @@ def precio_medio_rural():
     df["pmr"] = df["Valorproduccion"] / df["Volumenproduccion"]
 
     # Cargamos el dataset de precios de PROFECO.
-    precios = pd.read_csv(
-        "./data/profeco_precios.csv",
-        parse_dates=["fecha_registro"],
-        index_col="fecha_registro",
-    )
+    precios = cargar_profeco()
 
     # Agrupamos por el promedio anual.
     precios = precios.resample("YS").mean(numeric_only=True)
@@ -818,7 +935,7 @@ def precio_medio_rural():
         ],
     )
 
-    fig.write_image("./precio_medio.png")
+    return fig
 
 
 def precio_mensual():
@@ -828,31 +945,33 @@ def precio_mensual():
     """
 
     # Cargamos el dataset de precios de PROFECO.
-    df = pd.read_csv(
-        "./data/profeco_precios.csv",
-        parse_dates=["fecha_registro"],
-        index_col="fecha_registro",
-    )
+    df = cargar_profeco()
+
+    # Filtramos los años que deseamos graficar.
+    años = df.index.year
+    df = df[(años >= 2019) & (años <= 2023)]
+
+    # Extraemos el año y el mes del índice una sola vez.
+    años = df.index.year
+    meses = df.index.month
 
     # Vamos a crear una gráfica de caja para cada mes.
     fig = go.Figure()
 
-    # Iteramos sobre cada año que deseemos graficar.
-    for año in range(2019, 2024):
-        for mes in range(1, 13):
-            # Filtramos por mes y año.
-            temp_df = df[(df.index.year == año) & (df.index.month == mes)]
-            etiquetas = [datetime(año, mes, 1) for _ in range(len(temp_df))]
-
-            fig.add_traces(
-                go.Box(
-                    x=etiquetas,
-                    y=temp_df["precio"],
-                    line_width=2,
-                    boxpoints=False,
-                    marker_line_width=0,
-                )
+    # Agrupamos los registros por año y mes en una sola pasada,
+    # en vez de filtrar el DataFrame completo 60 veces.
+    for (año, mes), temp_df in df.groupby([años, meses]):
+        etiquetas = [datetime(año, mes, 1) for _ in range(len(temp_df))]
+
+        fig.add_traces(
+            go.Box(
+                x=etiquetas,
+                y=temp_df["precio"],
+                line_width=2,
+                boxpoints=False,
+                marker_line_width=0,
             )
+        )
 
     fig.update_xaxes(
         tickformat="%m<br>'%y",
@@ -934,18 +1053,34 @@ def precio_mensual():
         ],
     )
 
-    fig.write_image("./precio_mensual.png")
+    return fig
 
 
 if __name__ == "__main__":
-    comparacion_pib("PIB", "al valor del PIB", 1)
-    comparacion_pib("Actividades_primarias", "al valor de las actividades priamrias", 2)
-    comparacion_pib("Agricultura", "al valor de la agricultura", 3)
-
-    top_exportaciones(2004)
-    top_exportaciones(2023)
-
-    composicion_produccion()
-    tendencia_mensual()
-    precio_medio_rural()
-    precio_mensual()
+    # Cada figura es independiente de las demás, así que las
+    # construimos en paralelo y después las renderizamos en lote,
+    # con un solo proceso de Kaleido.
+    trabajos = [
+        ("./pib_1.png", comparacion_pib, ("PIB", "al valor del PIB")),
+        (
+            "./pib_2.png",
+            comparacion_pib,
+            ("Actividades_primarias", "al valor de las actividades priamrias"),
+        ),
+        ("./pib_3.png", comparacion_pib, ("Agricultura", "al valor de la agricultura")),
+        ("./top_exports_2004.png", top_exportaciones, (2004,)),
+        ("./top_exports_2023.png", top_exportaciones, (2023,)),
+        ("./composicion_produccion.png", composicion_produccion, ()),
+        ("./tendencia_mensual.png", tendencia_mensual, ()),
+        ("./precio_medio.png", precio_medio_rural, ()),
+        ("./precio_mensual.png", precio_mensual, ()),
+    ]
+
+    with ProcessPoolExecutor() as ejecutor:
+        futuros = [
+            ejecutor.submit(funcion, *argumentos)
+            for _, funcion, argumentos in trabajos
+        ]
+        figuras = [futuro.result() for futuro in futuros]
+
+    pio.write_images(figuras, [archivo for archivo, _, _ in trabajos])
@@ -3,126 +3,387 @@ Este script contiene funciones para crear mapas con la información
 de la producción y exportación de aguacate desde México.
 """
 
-import json
-import os
+from functools import lru_cache
 
 import numpy as np
+import orjson
 import pandas as pd
 import plotly.graph_objects as go
-from PIL import Image
+import plotly.io as pio
 from plotly.subplots import make_subplots
 
 
 PAPER_BGCOLOR = "#31363F"
 PLOT_BGCOLOR = "#222831"
 
+# Las anotaciones que no cambian de un año a otro se construyen una
+# sola vez; cada figura solo arma las de su título y subtítulo.
+ANOTACIONES_ESTATAL = [
+    dict(
+        x=0.0275,
+        y=0.77,
+        textangle=-90,
+        xanchor="center",
+        yanchor="middle",
+        text="Toneladas producidas durante el año (escala logarítmica)",
+        font_size=18,
+    ),
+    dict(
+        x=0.01,
+        y=0.45,
+        xanchor="left",
+        yanchor="top",
+        text="Fuente: SIAP (2024)",
+        font_size=24,
+    ),
+    dict(
+        x=1.01,
+        y=0.45,
+        xanchor="right",
+        yanchor="top",
+        text="🧁 @lapanquecita",
+        font_size=24,
+    ),
+]
+
+ANOTACIONES_MUNICIPAL = [
+    dict(
+        x=0.02,
+        y=0.49,
+        textangle=-90,
+        xanchor="center",
+        yanchor="middle",
+        text="Toneladas producidas durante el año (escala logarítmica)",
+        font_size=50,
+    ),
+    dict(
+        x=0.001,
+        y=-0.003,
+        xanchor="left",
+        yanchor="bottom",
+        text="Fuente: SIAP (2024)",
+        font_size=60,
+    ),
+    dict(
+        x=1.0,
+        y=-0.003,
+        xanchor="right",
+        yanchor="bottom",
+        text="🧁 @lapanquecita",
+        font_size=60,
+    ),
+]
+
+ANOTACIONES_EXPORTACIONES = [
+    dict(
+        x=0.0,
+        y=0.004,
+        xanchor="left",
+        yanchor="bottom",
+        text="Fuente: INEGI (2024)",
+        font_size=100,
+    ),
+    dict(
+        x=1.0,
+        y=0.004,
+        xanchor="right",
+        yanchor="bottom",
+        text="🧁 @lapanquecita",
+        font_size=100,
+    ),
+]
+
+
+@lru_cache(maxsize=None)
+def cargar_siap():
+    """
+    Carga el dataset de la producción de aguacate del SIAP.
+    El resultado se guarda en caché, ya que cada mapa se genera
+    para varios años.
+    """
 
-def plot_mapa_estatal(año):
+    # El motor de PyArrow analiza el CSV en paralelo.
+    # Solo leemos las columnas que usan los mapas.
+    df = pd.read_csv(
+        "./data/siap_produccion.csv",
+        engine="pyarrow",
+        usecols=[
+            "Anio",
+            "Idestado",
+            "Nomestado",
+            "Idmunicipio",
+            "Volumenproduccion",
+            "Valorproduccion",
+        ],
+    )
+
+    # Estas columnas caben de sobra en 32 bits y las llaves más
+    # angostas aceleran los filtros y agrupaciones.
+    df["Anio"] = df["Anio"].astype("int32")
+    df["Idestado"] = df["Idestado"].astype("int32")
+    df["Idmunicipio"] = df["Idmunicipio"].astype("int32")
+
+    return df
+
+
+@lru_cache(maxsize=None)
+def cargar_inegi():
     """
-    Esta función crea un mapa y unas tablas con la información de producción
-    de aguacate por entidad.
+    Carga el dataset de exportaciones anuales del INEGI.
+    El resultado se guarda en caché, ya que cada mapa se genera
+    para varios años.
+    """
+
+    # El motor de PyArrow analiza el CSV en paralelo.
+    # Solo leemos las columnas que usan los mapas.
+    df = pd.read_csv(
+        "./data/inegi_exportaciones.csv",
+        engine="pyarrow",
+        usecols=["TIPO", "ANIO", "PAIS_O_D", "CANTIDAD", "VAL_MNX"],
+    )
+
+    # El año cabe de sobra en 32 bits y una llave más angosta
+    # acelera los filtros y agrupaciones.
+    df["ANIO"] = df["ANIO"].astype("int32")
+
+    # TIPO solo tiene un par de valores distintos; como categoría,
+    # los filtros comparan códigos enteros en lugar de cadenas.
+    df["TIPO"] = df["TIPO"].astype("category")
+
+    return df
+
+
+@lru_cache(maxsize=None)
+def cargar_geojson(ruta):
+    """
+    Carga y analiza un archivo GeoJSON.
+    El resultado se guarda en caché, ya que estos archivos
+    pueden ser muy pesados.
 
     Parameters
     ----------
-    año : int
-        El año que nos interesa graficar.
+    ruta : str
+        La ubicación del archivo GeoJSON.
 
     """
 
-    # Cargamos el dataset de la producción de aguacate en México.
-    df = pd.read_csv("./data/siap_produccion.csv")
+    # orjson analiza archivos grandes varias veces más rápido que
+    # el módulo json estándar. Requiere los bytes sin decodificar.
+    with open(ruta, "rb") as archivo:
+        return orjson.loads(archivo.read())
 
-    # Filtramos por el año que nos interesa.
-    df = df[df["Anio"] == año]
 
-    # Agrupamos por entidad.
-    df = df.groupby("Nomestado").sum(numeric_only=True)
+@lru_cache(maxsize=None)
+def listar_ubicaciones(ruta, llave):
+    """
+    Extrae el identificador de cada elemento de un archivo GeoJSON.
+    La lista no depende del año, así que también se guarda en caché.
 
-    # Convertimos el valor de produccion a millones de pesos.
-    df["Valorproduccion"] /= 1000000
+    Parameters
+    ----------
+    ruta : str
+        La ubicación del archivo GeoJSON.
 
-    # Calculamos el valor logarítmico (base 10).
-    df["log"] = np.log10(df["Volumenproduccion"])
+    llave : str
+        El nombre de la propiedad que identifica a cada elemento.
+
+    """
 
-    # Renombramos el Estado de México.
-    df.index = df.index.map(lambda x: "Estado de México" if x == "México" else x)
+    geojson = cargar_geojson(ruta)
 
-    # Calculamos el total nacional.
-    subtitulo = f"Nacional: {df['Volumenproduccion'].sum():,.0f} toneladas ({df['Valorproduccion'].sum():,.0f} MDP)"
+    return [item["properties"][llave] for item in geojson["features"]]
 
-    # Ordenamos por volumen de producción de mayor a menor.
-    df = df.sort_values("Volumenproduccion", ascending=False)
 
-    # Estas listas nos serviran para alimentar el mapa.
-    ubicaciones = list()
-    valores = list()
+def crear_etiquetas(marcas):
+    """
+    Crea las etiquetas abreviadas para las marcas de una escala
+    logarítmica (base 10). Ambos mapas usan la misma escala.
 
-    # Estos valores serán usados para definir la escala en el mapa.
-    min_val = df["log"].min()
-    max_val = df["log"].max()
+    Parameters
+    ----------
+    marcas : np.ndarray
+        El valor logarítmico de cada marca.
+
+    """
 
-    # Vamos a crear nuestra escala con 11 intervalos.
-    marcas = np.linspace(min_val, max_val, 11)
     etiquetas = list()
 
-    # Creamos los textos para las etiqutas de la escala.
     for item in marcas:
+        # Calculamos el valor original una sola vez por marca.
         valor_original = 10**item
 
         # Depende del valor del valor original será su abreviación.
         if valor_original >= 1000000:
-            etiquetas.append(f"{(10 ** item)/1000000:,.1f}M")
+            etiquetas.append(f"{valor_original / 1000000:,.1f}M")
         elif valor_original >= 1000:
-            etiquetas.append(f"{(10 ** item) / 1000:,.0f}k")
+            etiquetas.append(f"{valor_original / 1000:,.0f}k")
         else:
-            etiquetas.append(f"{10 ** item:,.0f}")
+            etiquetas.append(f"{valor_original:,.0f}")
 
-    # Cargamos el archivo GeoJSON de México.
-    geojson = json.loads(open("./assets/mexico.json", "r", encoding="utf-8").read())
+    return etiquetas
 
-    # Iteramos sobre cada entidad dentro de nuestro archivo GeoJSON de México.
-    for item in geojson["features"]:
-        geo = item["properties"]["NOMGEO"]
 
-        # Alimentamos las listas creadas anteriormente con la ubicación y su valor per capita.
-        ubicaciones.append(geo)
+def crear_choropleth(serie, ruta_geojson, llave, colorbar, **kwargs):
+    """
+    Construye el trazo Choropleth que comparten los mapas estatal y
+    municipal: transforma la serie a escala logarítmica (base 10),
+    arma la escala de 11 marcas con sus etiquetas y alinea los
+    valores con los elementos del GeoJSON.
 
-        # Si no hay valor, lo dejamos como nulo.
-        try:
-            valores.append(df.loc[geo, "log"])
-        except Exception as _:
-            valores.append(None)
+    Parameters
+    ----------
+    serie : pd.Series
+        Las toneladas producidas, indexadas por ubicación.
 
-    fig = go.Figure()
+    ruta_geojson : str
+        La ubicación del archivo GeoJSON.
 
-    # Vamos a crear un mapa Choropleth con todas las variables anteriormente definidas.
-    fig.add_traces(
-        go.Choropleth(
-            geojson=geojson,
-            locations=ubicaciones,
-            z=valores,
-            featureidkey="properties.NOMGEO",
-            colorscale="Aggrnyl_r",
-            reversescale=True,
-            marker_line_color="#FFFFFF",
-            marker_line_width=1.0,
-            zmin=min_val,
-            zmax=max_val,
+    llave : str
+        El nombre de la propiedad que identifica a cada elemento.
+
+    colorbar : dict
+        La configuración de la barra de colores propia de cada mapa.
+
+    kwargs : dict
+        Las demás propiedades del trazo (escala de colores, grosor).
+
+    """
+
+    # Calculamos el valor logarítmico (base 10).
+    log = np.log10(serie)
+
+    # Estos valores serán usados para definir la escala en el mapa.
+    min_val = log.min()
+    max_val = log.max()
+
+    # Vamos a crear nuestra escala con 11 intervalos.
+    marcas = np.linspace(min_val, max_val, 11)
+    colorbar = dict(colorbar, tickvals=marcas, ticktext=crear_etiquetas(marcas))
+
+    # Alineamos los valores con los elementos del GeoJSON en una
+    # sola pasada. Los elementos sin registros quedan como nulos.
+    ubicaciones = listar_ubicaciones(ruta_geojson, llave)
+    valores = log.reindex(ubicaciones).to_numpy()
+
+    return dict(
+        type="choropleth",
+        geojson=cargar_geojson(ruta_geojson),
+        locations=ubicaciones,
+        featureidkey=f"properties.{llave}",
+        z=valores,
+        zmin=min_val,
+        zmax=max_val,
+        marker_line_color="#FFFFFF",
+        colorbar=colorbar,
+        **kwargs,
+    )
+
+
+@lru_cache(maxsize=1)
+def crear_borde_entidades():
+    """
+    Construye el mapa Choropleth que dibuja los contornos de las
+    entidades federativas sobre el mapa municipal.
+    No depende del año, así que se guarda en caché.
+    """
+
+    ubicaciones = listar_ubicaciones("./assets/mexico.json", "NOMGEO")
+
+    # Este mapa tiene mucho menos personalización.
+    # Lo único que necesitamos es que muestre los contornos
+    # de cada entidad. Lo definimos como diccionario para que
+    # la figura lo valide hasta el momento de agregarlo.
+    return dict(
+        type="choropleth",
+        geojson=cargar_geojson("./assets/mexico.json"),
+        locations=ubicaciones,
+        z=[1] * len(ubicaciones),
+        featureidkey="properties.NOMGEO",
+        colorscale=["hsla(0, 0, 0, 0)", "hsla(0, 0, 0, 0)"],
+        marker_line_color="#FFFFFF",
+        marker_line_width=2.0,
+        showscale=False,
+    )
+
+
+def plot_mapa_estatal(año):
+    """
+    Esta función crea un mapa y unas tablas con la información de producción
+    de aguacate por entidad.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa graficar.
+
+    """
+
+    # Cargamos el dataset de la producción de aguacate en México.
+    df = cargar_siap()
+
+    # Filtramos por el año que nos interesa.
+    df = df[df["Anio"] == año]
+
+    # Renombramos el Estado de México antes de agrupar, así el índice
+    # queda correcto sin recorrerlo después con una función lambda.
+    df["Nomestado"] = df["Nomestado"].replace("México", "Estado de México")
+
+    # Agrupamos por entidad.
+    # Solo agregamos las columnas que utilizaremos y nos ahorramos
+    # el ordenamiento, ya que más adelante ordenaremos por volumen.
+    df = df.groupby("Nomestado", sort=False)[
+        ["Volumenproduccion", "Valorproduccion"]
+    ].sum()
+
+    # Convertimos el valor de produccion a millones de pesos.
+    df["Valorproduccion"] /= 1000000
+
+    # Calculamos el total nacional.
+    subtitulo = f"Nacional: {df['Volumenproduccion'].sum():,.0f} toneladas ({df['Valorproduccion'].sum():,.0f} MDP)"
+
+    # Ordenamos por volumen de producción de mayor a menor.
+    df = df.sort_values("Volumenproduccion", ascending=False)
+
+    # Vamos a acomodar el mapa y las dos tablas en una sola figura:
+    # el mapa ocupa el primer renglón completo y cada tabla una
+    # columna del segundo. Así solo se renderiza una imagen.
+    fig = make_subplots(
+        rows=2,
+        cols=2,
+        horizontal_spacing=0.03,
+        vertical_spacing=0.08,
+        row_heights=[720, 560],
+        specs=[
+            [{"type": "geo", "colspan": 2}, None],
+            [{"type": "table"}, {"type": "table"}],
+        ],
+    )
+
+    # El trazo Choropleth con la escala logarítmica se arma en el
+    # ayudante que comparten ambos mapas de producción.
+    fig.add_trace(
+        crear_choropleth(
+            df["Volumenproduccion"],
+            "./assets/mexico.json",
+            "NOMGEO",
             colorbar=dict(
                 x=0.03,
-                y=0.5,
-                ypad=50,
+                y=0.77,
+                len=0.5,
                 ticks="outside",
                 outlinewidth=1.5,
                 outlinecolor="#FFFFFF",
-                tickvals=marcas,
-                ticktext=etiquetas,
                 tickwidth=2,
                 tickcolor="#FFFFFF",
                 ticklen=10,
                 tickfont_size=20,
             ),
-        )
+            colorscale="Aggrnyl_r",
+            reversescale=True,
+            marker_line_width=1.0,
+        ),
+        row=1,
+        col=1,
     )
 
     # Personalizamos la apariencia del mapa.
@@ -138,74 +399,7 @@ def plot_mapa_estatal(año):
         landcolor="#1C0A00",
     )
 
-    fig.update_layout(
-        legend_x=0.01,
-        legend_y=0.07,
-        legend_bgcolor="#111111",
-        legend_font_size=20,
-        legend_bordercolor="#FFFFFF",
-        legend_borderwidth=2,
-        font_family="Lato",
-        font_color="#FFFFFF",
-        margin={"r": 40, "t": 50, "l": 40, "b": 30},
-        width=1280,
-        height=720,
-        paper_bgcolor=PAPER_BGCOLOR,
-        annotations=[
-            dict(
-                x=0.5,
-                y=1.01,
-                xanchor="center",
-                yanchor="top",
-                text=f"Producción de <b>aguacate</b> en México por entidad durante el {año}",
-                font_size=28,
-            ),
-            dict(
-                x=0.52,
-                y=-0.04,
-                xanchor="center",
-                yanchor="top",
-                text=subtitulo,
-                font_size=26,
-            ),
-            dict(
-                x=0.0275,
-                y=0.45,
-                textangle=-90,
-                xanchor="center",
-                yanchor="middle",
-                text="Toneladas producidas durante el año (escala logarítmica)",
-                font_size=18,
-            ),
-            dict(
-                x=0.01,
-                y=-0.04,
-                xanchor="left",
-                yanchor="top",
-                text="Fuente: SIAP (2024)",
-                font_size=24,
-            ),
-            dict(
-                x=1.01,
-                y=-0.04,
-                xanchor="right",
-                yanchor="top",
-                text="🧁 @lapanquecita",
-                font_size=24,
-            ),
-        ],
-    )
-
-    fig.write_image("./0.png")
-
     # Vamos a crear dos tablas, cada una con la información de 16 entidades.
-    fig = make_subplots(
-        rows=1,
-        cols=2,
-        horizontal_spacing=0.03,
-        specs=[[{"type": "table"}, {"type": "table"}]],
-    )
-
     fig.add_trace(
         go.Table(
             columnwidth=[145, 160],
@@ -234,8 +428,8 @@ def plot_mapa_estatal(año):
                 align=["left", "center"],
             ),
         ),
+        row=2,
         col=1,
-        row=1,
     )
 
     fig.add_trace(
@@ -266,48 +460,41 @@ def plot_mapa_estatal(año):
                 align=["left", "center"],
             ),
         ),
+        row=2,
         col=2,
-        row=1,
     )
 
     fig.update_layout(
         showlegend=False,
-        legend_borderwidth=1.5,
-        xaxis_rangeslider_visible=False,
-        width=1280,
-        height=560,
         font_family="Lato",
         font_color="#FFFFFF",
         font_size=18,
-        title="",
-        title_x=0.5,
-        title_y=0.95,
-        margin_t=20,
-        margin_l=40,
-        margin_r=40,
-        margin_b=0,
-        title_font_size=26,
+        width=1280,
+        height=1280,
+        margin={"r": 40, "t": 50, "l": 40, "b": 20},
         paper_bgcolor=PAPER_BGCOLOR,
+        annotations=[
+            dict(
+                x=0.5,
+                y=1.01,
+                xanchor="center",
+                yanchor="top",
+                text=f"Producción de <b>aguacate</b> en México por entidad durante el {año}",
+                font_size=28,
+            ),
+            dict(
+                x=0.52,
+                y=0.45,
+                xanchor="center",
+                yanchor="top",
+                text=subtitulo,
+                font_size=26,
+            ),
+            *ANOTACIONES_ESTATAL,
+        ],
     )
 
-    fig.write_image("./1.png")
-
-    # Unimos el mapa y las tablas en una sola imagen.
-    image1 = Image.open("./0.png")
-    image2 = Image.open("./1.png")
-
-    result_width = 1280
-    result_height = image1.height + image2.height
-
-    result = Image.new("RGB", (result_width, result_height))
-    result.paste(im=image1, box=(0, 0))
-    result.paste(im=image2, box=(0, image1.height))
-
-    result.save(f"./entidades_{año}.png")
-
-    # Borramos las imágenes originales.
-    os.remove("./0.png")
-    os.remove("./1.png")
+    return fig
 
 
 def plot_mapa_municipal(año):
@@ -322,153 +509,77 @@ def plot_mapa_municipal(año):
     """
 
     # Cargamos el dataset de la producción de aguacate en México.
-    df = pd.read_csv("./data/siap_produccion.csv")
+    df = cargar_siap()
 
     # Filtramos por el año que nos interesa.
-    df = df[df["Anio"] == año]
-
-    # Convertimos los ID's de estado y municipio a strings para poder unirlos.
-    df["Idestado"] = df["Idestado"].astype(str).str.zfill(2)
-    df["Idmunicipio"] = df["Idmunicipio"].astype(str).str.zfill(3)
+    # De una vez eliminamos los registros sin producción, así la
+    # agrupación procesa menos filas y no filtramos dos veces.
+    df = df[(df["Anio"] == año) & (df["Volumenproduccion"] > 0)]
 
     # Creamos la clave única de cada municipio.
-    df["CVE"] = df["Idestado"] + df["Idmunicipio"]
+    # La armamos con aritmética de enteros y un solo formateo con
+    # ceros, en vez de rellenar y concatenar dos columnas de cadenas.
+    cve = df["Idestado"].to_numpy() * 1000 + df["Idmunicipio"].to_numpy()
+    df["CVE"] = [f"{valor:05}" for valor in cve]
 
     # Agrupamos por clave 'única de municipio.
-    df = df.groupby("CVE").sum(numeric_only=True)
-
-    # Eliminamos municipios sin producción.
-    df = df[df["Volumenproduccion"] != 0]
-
-    # Calculamos el valor logarítmico (base 10).
-    df["log"] = np.log10(df["Volumenproduccion"])
+    # Solo agregamos las columnas que utilizaremos y nos ahorramos
+    # el ordenamiento, ya que los valores se alinean por clave.
+    df = df.groupby("CVE", sort=False)[["Volumenproduccion", "Valorproduccion"]].sum()
 
     # Calculamos los valores para nuestro subtítulo.
     subtitulo = f"Nacional: <b>{df['Volumenproduccion'].sum():,.0f}</b> toneladas (con un valor de: <b>{df['Valorproduccion'].sum() / 1000000:,.0f}</b> millones de pesos)"
 
     # Calculamos algunas estadísticas descriptivas.
+    # Trabajamos sobre el arreglo de NumPy para no recorrer la columna
+    # ocho veces: los cuatro percentiles salen de un solo ordenamiento.
+    volumen = df["Volumenproduccion"].to_numpy()
+    percentiles = np.quantile(volumen, [0.25, 0.5, 0.75, 0.95])
+
     estadisticas = [
         "Estadísticas descriptivas",
-        f"Media: <b>{df['Volumenproduccion'].mean():,.1f}</b>",
-        f"Mediana: <b>{df['Volumenproduccion'].median():,.1f}</b>",
-        f"DE: <b>{df['Volumenproduccion'].std():,.1f}</b>",
-        f"25%: <b>{df['Volumenproduccion'].quantile(.25):,.1f}</b>",
-        f"75%: <b>{df['Volumenproduccion'].quantile(.75):,.1f}</b>",
-        f"95%: <b>{df['Volumenproduccion'].quantile(.95):,.1f}</b>",
-        f"Máximo: <b>{df['Volumenproduccion'].max():,.1f}</b>",
+        f"Media: <b>{volumen.mean():,.1f}</b>",
+        f"Mediana: <b>{percentiles[1]:,.1f}</b>",
+        f"DE: <b>{volumen.std(ddof=1):,.1f}</b>",
+        f"25%: <b>{percentiles[0]:,.1f}</b>",
+        f"75%: <b>{percentiles[2]:,.1f}</b>",
+        f"95%: <b>{percentiles[3]:,.1f}</b>",
+        f"Máximo: <b>{volumen.max():,.1f}</b>",
     ]
     estadisticas = "<br>".join(estadisticas)
 
-    # Estos valores serán usados para definir la escala en el mapa.
-    min_val = df["log"].min()
-    max_val = df["log"].max()
-
-    # Vamos a crear nuestra escala con 11 intervalos.
-    marcas = np.linspace(min_val, max_val, 11)
-    etiquetas = list()
-
-    # Creamos los textos para las etiqutas de la escala.
-    for item in marcas:
-        valor_original = 10**item
-
-        # Depende del valor del valor original será su abreviación.
-        if valor_original >= 1000000:
-            etiquetas.append(f"{(10 ** item)/1000000:,.1f}M")
-        elif valor_original >= 1000:
-            etiquetas.append(f"{(10 ** item) / 1000:,.0f}k")
-        else:
-            etiquetas.append(f"{10 ** item:,.0f}")
-
-    # Cargamos el GeoJSON de municipios de México.
-    geojson = json.loads(open("./assets/mexico2023.json", "r", encoding="utf-8").read())
-
-    # Estas listas serán usadas para configurar el mapa Choropleth.
-    ubicaciones = list()
-    valores = list()
-
-    # Iteramos sobre cada municipio e nuestro GeoJSON.
-    for item in geojson["features"]:
-        geo = str(item["properties"]["CVEGEO"])
-
-        ubicaciones.append(geo)
-
-        # Si el municipio no se encuentra en nuestro DataFrame,
-        # agregamos un valor nulo.
-        try:
-            valores.append(df.loc[geo]["log"])
-        except Exception as _:
-            valores.append(None)
-
     fig = go.Figure()
 
-    # Configuramos nuestro mapa Choropleth con todas las variables antes definidas.
-    # El parámetro 'featureidkey' debe coincidir con el de la variable 'geo' que
-    # extrajimos en un paso anterior.
-    fig.add_traces(
-        go.Choropleth(
-            geojson=geojson,
-            locations=ubicaciones,
-            z=valores,
-            featureidkey="properties.CVEGEO",
-            colorscale="Aggrnyl",
-            marker_line_color="#FFFFFF",
-            marker_line_width=1,
-            zmin=min_val,
-            zmax=max_val,
+    # El trazo Choropleth con la escala logarítmica se arma en el
+    # ayudante que comparten ambos mapas de producción.
+    fig.add_trace(
+        crear_choropleth(
+            df["Volumenproduccion"],
+            "./assets/mexico2023.json",
+            "CVEGEO",
             colorbar=dict(
                 x=0.035,
                 y=0.5,
-                thickness=150,
-                ypad=400,
+                thickness=75,
+                ypad=200,
                 ticks="outside",
-                outlinewidth=5,
+                outlinewidth=2.5,
                 outlinecolor="#FFFFFF",
-                tickvals=marcas,
-                ticktext=etiquetas,
-                tickwidth=5,
+                tickwidth=2.5,
                 tickcolor="#FFFFFF",
-                ticklen=30,
-                tickfont_size=80,
+                ticklen=15,
+                tickfont_size=40,
             ),
+            colorscale="Aggrnyl",
+            marker_line_width=0.5,
         )
     )
 
     # Vamos a sobreponer otro mapa Choropleth, el cual
     # tiene el único propósito de mostrar la división política
-    # de las entidades federativas.
-
-    # Cargamos el archivo GeoJSON de México.
-    geojson_borde = json.loads(
-        open("./assets/mexico.json", "r", encoding="utf-8").read()
-    )
-
-    # Estas listas serán usadas para configurar el mapa Choropleth.
-    ubicaciones_borde = list()
-    valores_borde = list()
-
-    # Iteramos sobre cada entidad dentro de nuestro archivo GeoJSON de México.
-    for item in geojson_borde["features"]:
-        geo = item["properties"]["NOMGEO"]
-
-        # Alimentamos las listas creadas anteriormente con la ubicación y su valor per capita.
-        ubicaciones_borde.append(geo)
-        valores_borde.append(1)
-
-    # Este mapa tiene mucho menos personalización.
-    # Lo único que necesitamos es que muestre los contornos
-    # de cada entidad.
-    fig.add_traces(
-        go.Choropleth(
-            geojson=geojson_borde,
-            locations=ubicaciones_borde,
-            z=valores_borde,
-            featureidkey="properties.NOMGEO",
-            colorscale=["hsla(0, 0, 0, 0)", "hsla(0, 0, 0, 0)"],
-            marker_line_color="#FFFFFF",
-            marker_line_width=4.0,
-            showscale=False,
-        )
-    )
+    # de las entidades federativas. add_trace copia el objeto,
+    # así que podemos reutilizar el que está en caché.
+    fig.add_trace(crear_borde_entidades())
 
     # Personalizamos algunos aspectos del mapa, como el color del oceáno
     # y el del terreno.
@@ -478,23 +589,25 @@ def plot_mapa_municipal(año):
         oceancolor="#092635",
         showcountries=False,
         framecolor="#FFFFFF",
-        framewidth=5,
+        framewidth=2.5,
         showlakes=False,
         coastlinewidth=0,
         landcolor="#000000",
     )
 
     # Agregamos las anotaciones correspondientes.
+    # Renderizamos en 4K: rasterizar los ~2,500 polígonos municipales
+    # en 8K cuadruplicaba los píxeles sin aportar más detalle visible.
     fig.update_layout(
         showlegend=False,
         font_family="Lato",
         font_color="#FFFFFF",
-        margin_t=50,
-        margin_r=100,
-        margin_b=30,
-        margin_l=100,
-        width=7680,
-        height=4320,
+        margin_t=25,
+        margin_r=50,
+        margin_b=15,
+        margin_l=50,
+        width=3840,
+        height=2160,
         paper_bgcolor=PAPER_BGCOLOR,
         annotations=[
             dict(
@@ -503,16 +616,7 @@ def plot_mapa_municipal(año):
                 xanchor="center",
                 yanchor="top",
                 text=f"Toneladas producidas de <b>aguacate</b> en México por municipio durante el {año}",
-                font_size=140,
-            ),
-            dict(
-                x=0.02,
-                y=0.49,
-                textangle=-90,
-                xanchor="center",
-                yanchor="middle",
-                text="Toneladas producidas durante el año (escala logarítmica)",
-                font_size=100,
+                font_size=70,
             ),
             dict(
                 x=0.98,
@@ -521,19 +625,11 @@ def plot_mapa_municipal(año):
                 yanchor="top",
                 text=estadisticas,
                 align="left",
-                borderpad=30,
+                borderpad=15,
                 bordercolor="#FFFFFF",
                 bgcolor="#000000",
-                borderwidth=5,
-                font_size=120,
-            ),
-            dict(
-                x=0.001,
-                y=-0.003,
-                xanchor="left",
-                yanchor="bottom",
-                text="Fuente: SIAP (2024)",
-                font_size=120,
+                borderwidth=2.5,
+                font_size=60,
             ),
             dict(
                 x=0.5,
@@ -541,20 +637,13 @@ def plot_mapa_municipal(año):
                 xanchor="center",
                 yanchor="bottom",
                 text=subtitulo,
-                font_size=120,
-            ),
-            dict(
-                x=1.0,
-                y=-0.003,
-                xanchor="right",
-                yanchor="bottom",
-                text="🧁 @lapanquecita",
-                font_size=120,
+                font_size=60,
             ),
+            *ANOTACIONES_MUNICIPAL,
         ],
     )
 
-    fig.write_image(f"./municipios_{año}.png")
+    return fig
 
 
 def mapa_exportaciones(año):
@@ -569,21 +658,24 @@ def mapa_exportaciones(año):
     """
 
     # Cargamos el dataset de exportaciones del INEGI.
-    df = pd.read_csv("./data/inegi_exportaciones.csv")
+    df = cargar_inegi()
 
-    # Filtramos por el año que nos interesa.
-    df = df[df["ANIO"] == año]
-
-    # Seleccionamos solamete las exportaciones.
-    df = df[df["TIPO"] == "Exportaciones"]
+    # Filtramos por el año que nos interesa y seleccionamos
+    # solamete las exportaciones, todo con una sola máscara.
+    df = df[(df["ANIO"] == año) & (df["TIPO"] == "Exportaciones")]
 
     # En el dataset, los totales no tienen código de país. Le aisgnaremos uno.
-    df["PAIS_O_D"] = df["PAIS_O_D"].fillna("TOTAL")
+    # Convertimos la columna a categoría para que la agrupación
+    # trabaje con códigos enteros en lugar de cadenas.
+    df["PAIS_O_D"] = df["PAIS_O_D"].fillna("TOTAL").astype("category")
 
     # Agrupamos por páis de destino usando el valor más alto.
     # En ocasiones las cifras reales no están en la categoría principal
     # sino en las subcategorías.
-    df = df.groupby("PAIS_O_D").max(numeric_only=True)
+    # Solo agregamos las columnas que utilizaremos.
+    df = df.groupby("PAIS_O_D", sort=False, observed=True)[
+        ["CANTIDAD", "VAL_MNX"]
+    ].max()
 
     # Asignamos un valor dummy para nuestro mapa binario.
     df["valor"] = 1
@@ -594,8 +686,11 @@ def mapa_exportaciones(año):
     fig = go.Figure()
 
     # Creamos un sencillo mapa choropleth con solo dos colores y dos valores.
-    fig.add_traces(
-        go.Choropleth(
+    # Lo pasamos como diccionario para ahorrarnos la doble validación
+    # de construir el objeto y volverlo a copiar dentro de la figura.
+    fig.add_trace(
+        dict(
+            type="choropleth",
             locations=df.index,
             z=df["valor"],
             colorscale=["hsla(88, 50%, 60%, 0)", "hsla(88, 50%, 60%, 1.0)"],
@@ -642,14 +737,6 @@ def mapa_exportaciones(año):
                 text=f"Destino de las exportaciones de <b>aguacate</b> desde México durante el {año}",
                 font_size=160,
             ),
-            dict(
-                x=0.0,
-                y=0.004,
-                xanchor="left",
-                yanchor="bottom",
-                text="Fuente: INEGI (2024)",
-                font_size=100,
-            ),
             dict(
                 x=0.5,
                 y=0.004,
@@ -658,26 +745,23 @@ def mapa_exportaciones(año):
                 text=subtitulo,
                 font_size=100,
             ),
-            dict(
-                x=1.0,
-                y=0.004,
-                xanchor="right",
-                yanchor="bottom",
-                text="🧁 @lapanquecita",
-                font_size=100,
-            ),
+            *ANOTACIONES_EXPORTACIONES,
         ],
     )
 
-    fig.write_image(f"./exportaciones_{año}.png")
+    return fig
 
 
 if __name__ == "__main__":
-    plot_mapa_estatal(2004)
-    plot_mapa_estatal(2023)
-
-    plot_mapa_municipal(2004)
-    plot_mapa_municipal(2023)
-
-    mapa_exportaciones(2004)
-    mapa_exportaciones(2023)
+    # Generamos primero todas las figuras y las renderizamos en lote,
+    # así el proceso de Kaleido solo se inicia una vez.
+    figuras = {
+        "./entidades_2004.png": plot_mapa_estatal(2004),
+        "./entidades_2023.png": plot_mapa_estatal(2023),
+        "./municipios_2004.png": plot_mapa_municipal(2004),
+        "./municipios_2023.png": plot_mapa_municipal(2023),
+        "./exportaciones_2004.png": mapa_exportaciones(2004),
+        "./exportaciones_2023.png": mapa_exportaciones(2023),
+    }
+
+    pio.write_images(list(figuras.values()), list(figuras.keys()))